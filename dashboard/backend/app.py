@@ -1,16 +1,24 @@
-from flask import Flask, jsonify, request
+from flask import Flask, jsonify, request, send_file
 from flask_cors import CORS
 import pandas as pd
 import numpy as np
 from datetime import datetime
 import json
-from data_handler import DataHandler
+import config
+from build_reports import ReportBuilder
+from data_handler import create_data_handler
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
-# Initialize data handler
-data_handler = DataHandler()
+# Scenario and report pool workers re-import this module as __mp_main__; they
+# only run simulation and render tasks, so they must not load the data or
+# start pools of their own
+if __name__ != '__mp_main__':
+    # Initialize data handler
+    data_handler = create_data_handler()
+    # Figures are rendered one at a time, into an untracked cache directory
+    report_builder = ReportBuilder(reports_dir=config.REPORTS_CACHE_DIR, workers=1)
 
 @app.route('/')
 def home():
@@ -22,16 +30,24 @@ def home():
             "/api/prices/<start_date>/<end_date>",
             "/api/change_points",
             "/api/events",
+            "/api/events/nearest",
             "/api/event_correlation/<event_id>",
             "/api/volatility",
-            "/api/summary_stats"
+            "/api/summary_stats",
+            "/api/scenarios",
+            "/api/reports/<name>.png"
         ]
     })
 
 @app.route('/api/prices', methods=['GET'])
 def get_prices():
-    """Get historical price data"""
+    """Get historical price data, or only the rows changed since a data version"""
     try:
+        since_version = request.args.get('since_version', type=int)
+        if since_version is not None:
+            delta = data_handler.get_price_delta(since_version, request.args.get('epoch'))
+            return jsonify(delta)
+        
         prices_data = data_handler.get_price_data()
         return jsonify(prices_data)
     except Exception as e:
@@ -57,10 +73,39 @@ def get_change_points():
 
 @app.route('/api/events', methods=['GET'])
 def get_events():
-    """Get geopolitical and economic events"""
+    """Get geopolitical and economic events, optionally filtered"""
+    try:
+        events = data_handler.get_events(
+            start_date=request.args.get('start'),
+            end_date=request.args.get('end'),
+            event_type=request.args.get('type'),
+            region=request.args.get('region')
+        )
+        return jsonify(events)
+    except ValueError as e:
+        # Malformed start/end dates
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/events/nearest', methods=['GET'])
+def get_nearest_events():
+    """Get the events closest in time to a date"""
     try:
-        events = data_handler.get_events()
+        date = request.args.get('date')
+        if not date:
+            return jsonify({"error": "date parameter is required"}), 400
+        
+        events = data_handler.get_nearest_events(
+            date,
+            limit=request.args.get('limit', 1, type=int),
+            event_type=request.args.get('type'),
+            region=request.args.get('region')
+        )
         return jsonify(events)
+    except ValueError as e:
+        # Malformed date
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -91,6 +136,30 @@ def get_summary_stats():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/scenarios', methods=['GET'])
+def get_scenarios():
+    """Simulate forward price paths and return a percentile fan chart"""
+    try:
+        scenarios = data_handler.run_scenarios(request.args)
+        return jsonify(scenarios)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/reports/<name>.png', methods=['GET'])
+def get_report(name):
+    """Get a report figure, re-rendering it only if its inputs changed"""
+    if name not in report_builder.figures:
+        return jsonify({"error": f"Unknown report: {name}"}), 404
+    try:
+        path = report_builder.get_figure(name)
+        if path is None:
+            return jsonify({"error": f"Inputs for report {name} are missing"}), 404
+        return send_file(path, mimetype='image/png')
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/price_impact', methods=['POST'])
 def calculate_price_impact():
     """Calculate price impact around specific dates"""
@@ -0,0 +1,44 @@
+import os
+import sys
+
+# Project layout
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+DASHBOARD_DIR = os.path.dirname(BACKEND_DIR)
+PROJECT_ROOT = os.path.dirname(DASHBOARD_DIR)
+SRC_DIR = os.path.join(PROJECT_ROOT, 'src')
+
+# Modules shared with the offline pipeline (events schema, reports, SQLite store) live in src/
+if SRC_DIR not in sys.path:
+    sys.path.append(SRC_DIR)
+
+# Events CSV written by src/fix_events_structure.py
+EVENTS_CSV_PATHS = [
+    os.path.join(PROJECT_ROOT, 'data', 'events', 'key_events_correct.csv'),
+    os.path.join(DASHBOARD_DIR, 'data', 'events', 'key_events_correct.csv'),
+]
+
+# Change point results written by the analysis
+CHANGE_POINTS_JSON_PATHS = [
+    os.path.join(PROJECT_ROOT, 'data', 'processed', 'change_point_results.json'),
+    os.path.join(DASHBOARD_DIR, 'data', 'processed', 'change_point_results.json'),
+]
+
+# Events within this many days of a change point are associated with it
+EVENT_MATCH_TOLERANCE_DAYS = int(os.environ.get('EVENT_MATCH_TOLERANCE_DAYS', 30))
+
+# Monte Carlo scenario engine
+SCENARIO_MAX_PATHS = int(os.environ.get('SCENARIO_MAX_PATHS', 200000))
+SCENARIO_MAX_HORIZON_DAYS = int(os.environ.get('SCENARIO_MAX_HORIZON_DAYS', 756))
+SCENARIO_CHUNK_PATHS = int(os.environ.get('SCENARIO_CHUNK_PATHS', 8192))
+SCENARIO_WORKERS = int(os.environ.get('SCENARIO_WORKERS', os.cpu_count() or 1))
+SCENARIO_CACHE_SIZE = int(os.environ.get('SCENARIO_CACHE_SIZE', 32))
+
+# Report figures rendered on demand by the API. Kept apart from the committed
+# PNGs in reports/, which only build_reports.py regenerates.
+REPORTS_CACHE_DIR = os.environ.get('REPORTS_CACHE_DIR', os.path.join(PROJECT_ROOT, 'reports', '.cache'))
+
+# Storage backend: 'memory' loads everything at startup, 'sqlite' queries SQLITE_PATH
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'memory')
+SQLITE_PATH = os.environ.get('SQLITE_PATH', os.path.join(PROJECT_ROOT, 'data', 'brent_oil.db'))
+SQLITE_POOL_SIZE = int(os.environ.get('SQLITE_POOL_SIZE', 5))
+PRICE_SERIES = os.environ.get('PRICE_SERIES', 'brent')
@@ -1,18 +1,35 @@
 import pandas as pd
 import numpy as np
+from bisect import bisect_right
 from datetime import datetime, timedelta
+import hashlib
 import json
 import os
+import threading
+import config
+from change_point_schema import load_change_point_json, to_api_change_points
+from event_store import EventStore
+from scenarios import ScenarioEngine
 
 class DataHandler:
     def __init__(self):
         # Load data from CSV files
-        self.price_data = self.load_price_data()
-        self.events_data = self.load_events_data()
-        self.change_points_data = self.load_change_points_data()
+        self.price_data, self.price_source, self.price_mtime = self.load_price_data()
+        self.init_price_versions()
+        self.event_store = self.load_event_store()
+        self.events_data = self.event_store.all()
+        self.change_points_data = self.event_store.match_change_points(
+            self.load_change_points_data(), config.EVENT_MATCH_TOLERANCE_DAYS
+        )
+        self.change_point_by_event = self.index_change_points_by_event()
+        self.scenario_engine = ScenarioEngine()
     
-    def load_price_data(self):
-        """Load historical Brent oil prices"""
+    def load_price_data(self, paths=None):
+        """Load historical Brent oil prices.
+        
+        Returns (records, source path, source mtime_ns); source and mtime are
+        None when sample data was generated instead.
+        """
         try:
             # Get the project root directory (brent-oil-analysis)
             current_file = os.path.abspath(__file__)  # C:\brent-oil-analysis\dashboard\backend\data_handler.py
@@ -28,6 +45,9 @@ class DataHandler:
                 os.path.join(dashboard_dir, 'data', 'processed', 'brent_oil_processed.csv'),  # C:\brent-oil-analysis\dashboard\data\processed\brent_oil_processed.csv
             ]
             
+            if paths is not None:
+                possible_paths = paths
+            
             data_loaded = False
             df = None
             
@@ -35,8 +55,11 @@ class DataHandler:
                 if os.path.exists(data_path):
                     print(f"Loading price data from: {data_path}")
                     try:
+                        # Stat first, so a write during the read shows up as a newer mtime
+                        source_mtime = os.stat(data_path).st_mtime_ns
                         df = pd.read_csv(data_path)
                         print(f"Successfully loaded file with shape: {df.shape}")
+                        source = data_path
                         data_loaded = True
                         break
                     except Exception as e:
@@ -45,7 +68,7 @@ class DataHandler:
             
             if not data_loaded:
                 print("No data file found in any of the checked locations. Generating sample data...")
-                return self.generate_sample_price_data()
+                return self.generate_sample_price_data(), None, None
             
             # Convert date column if exists
             date_column = None
@@ -76,7 +99,7 @@ class DataHandler:
                 df = df.dropna(subset=['price'])
             else:
                 print("Warning: No price column found. Using sample data.")
-                return self.generate_sample_price_data()
+                return self.generate_sample_price_data(), None, None
             
             # Sort by date
             df = df.sort_values('date')
@@ -92,12 +115,12 @@ class DataHandler:
             result_df = df[['date', 'price', 'log_return']].copy()
             result_df['date'] = result_df['date'].dt.strftime('%Y-%m-%d')
             
-            return result_df.to_dict('records')
+            return result_df.to_dict('records'), source, source_mtime
             
         except Exception as e:
             print(f"Error loading price data: {e}")
             print("Generating sample price data...")
-            return self.generate_sample_price_data()
+            return self.generate_sample_price_data(), None, None
     
     def generate_sample_price_data(self):
         """Generate sample price data for demonstration"""
@@ -174,8 +197,24 @@ class DataHandler:
         return result_df.to_dict('records')
     
     
-    def load_events_data(self):
-        """Load geopolitical and economic events"""
+    def load_event_store(self):
+        """Load events from the events CSV into an indexed store"""
+        for events_path in config.EVENTS_CSV_PATHS:
+            if os.path.exists(events_path):
+                print(f"Loading events from: {events_path}")
+                try:
+                    store = EventStore.from_csv(events_path)
+                    print(f"Successfully loaded {len(store)} events")
+                    return store
+                except Exception as e:
+                    print(f"Error reading {events_path}: {e}")
+                    continue
+        
+        print("No events file found. Using sample events...")
+        return EventStore(self.generate_sample_events_data())
+    
+    def generate_sample_events_data(self):
+        """Sample geopolitical and economic events for demonstration"""
         events = [
             {
                 "id": 1,
@@ -285,75 +324,218 @@ class DataHandler:
         return events
     
     def load_change_points_data(self):
-        """Load detected change points from Bayesian analysis"""
+        """Load detected change points from the analysis results JSON"""
+        for results_path in config.CHANGE_POINTS_JSON_PATHS:
+            if os.path.exists(results_path):
+                print(f"Loading change points from: {results_path}")
+                try:
+                    change_points = to_api_change_points(
+                        load_change_point_json(results_path), pd.DataFrame(self.price_data)
+                    )
+                    print(f"Successfully loaded {len(change_points)} change points")
+                    return change_points
+                except Exception as e:
+                    print(f"Error reading {results_path}: {e}")
+                    continue
+        
+        print("No change point results found. Using sample change points...")
+        return self.generate_sample_change_points()
+    
+    def generate_sample_change_points(self):
+        """Sample change points for demonstration"""
         change_points = [
             {
                 "date": "1990-08-15",
                 "probability": 0.92,
                 "before_mean": 18.5,
                 "after_mean": 28.7,
-                "change_percentage": 55.1,
-                "associated_events": [2]
+                "change_percentage": 55.1
             },
             {
                 "date": "2008-09-20",
                 "probability": 0.98,
                 "before_mean": 115.4,
                 "after_mean": 65.2,
-                "change_percentage": -43.5,
-                "associated_events": [6]
+                "change_percentage": -43.5
             },
             {
                 "date": "2014-06-15",
                 "probability": 0.95,
                 "before_mean": 110.5,
                 "after_mean": 60.3,
-                "change_percentage": -45.4,
-                "associated_events": [9]
+                "change_percentage": -45.4
             },
             {
                 "date": "2016-12-01",
                 "probability": 0.88,
                 "before_mean": 45.2,
                 "after_mean": 55.8,
-                "change_percentage": 23.5,
-                "associated_events": [10]
+                "change_percentage": 23.5
             },
             {
                 "date": "2020-03-15",
                 "probability": 0.99,
                 "before_mean": 65.4,
                 "after_mean": 30.1,
-                "change_percentage": -54.0,
-                "associated_events": [11, 12]
+                "change_percentage": -54.0
             },
             {
                 "date": "2022-03-01",
                 "probability": 0.93,
                 "before_mean": 75.6,
                 "after_mean": 105.3,
-                "change_percentage": 39.3,
-                "associated_events": [13]
+                "change_percentage": 39.3
             }
         ]
         return change_points
     
+    def index_change_points_by_event(self):
+        """Map each event id to the first change point it was matched with"""
+        index = {}
+        for cp in self.change_points_data:
+            for event_id in cp['associated_events']:
+                index.setdefault(event_id, cp)
+        return index
+    
+    def init_price_versions(self):
+        """Start version tracking from the initially loaded price file.
+        
+        The epoch identifies the data source and a version is the modification
+        time (in microseconds) of the file a row's current value was first
+        read from. Every server process reading the same file therefore agrees
+        on them, and any process answers a since_version query correctly.
+        """
+        self.price_lock = threading.Lock()
+        # Held across stat, reload and merge so one request reloads at a time
+        self.reload_lock = threading.Lock()
+        if self.price_source:
+            self.data_epoch = hashlib.sha256(os.path.abspath(self.price_source).encode()).hexdigest()[:16]
+            self.data_version = self.price_mtime // 1000
+        else:
+            # Sample data is generated identically by every process
+            self.data_epoch = 'sample'
+            self.data_version = 1
+        self.price_index = {r['date']: i for i, r in enumerate(self.price_data)}
+        # Dates appended or revised in each version, in increasing version order.
+        # Clients behind the first logged version must take a full reset.
+        self.log_versions = [self.data_version]
+        self.log_dates = [[r['date'] for r in self.price_data]]
+    
+    def apply_price_updates(self, records, version=None, replace=False):
+        """Merge appended or revised price rows as one new data version.
+        
+        With replace, records are the complete data set: rows missing from it
+        are removed, and the log restarts so every client resets. A version
+        newer than the current one is always taken, even if nothing changed.
+        """
+        with self.price_lock:
+            if replace:
+                dates = {r['date'] for r in records}
+                if any(d not in dates for d in self.price_index):
+                    self.price_data = sorted(records, key=lambda r: r['date'])
+                    self.price_index = {r['date']: i for i, r in enumerate(self.price_data)}
+                    self.data_version = max(version or 0, self.data_version + 1)
+                    self.log_versions = [self.data_version]
+                    self.log_dates = [[r['date'] for r in self.price_data]]
+                    print(f"Price data version {self.data_version}: rows removed, clients will reset")
+                    return self.data_version
+            
+            changed = []
+            needs_sort = False
+            for record in records:
+                pos = self.price_index.get(record['date'])
+                if pos is None:
+                    if self.price_data and record['date'] < self.price_data[-1]['date']:
+                        needs_sort = True
+                    self.price_index[record['date']] = len(self.price_data)
+                    self.price_data.append(record)
+                    changed.append(record['date'])
+                elif self.price_data[pos] != record:
+                    self.price_data[pos] = record
+                    changed.append(record['date'])
+            
+            if not changed and (version is None or version <= self.data_version):
+                return self.data_version
+            
+            if needs_sort:
+                self.price_data.sort(key=lambda r: r['date'])
+                self.price_index = {r['date']: i for i, r in enumerate(self.price_data)}
+            
+            # Versions must keep increasing even if the file's mtime moved backwards
+            self.data_version = max(version or 0, self.data_version + 1)
+            self.log_versions.append(self.data_version)
+            self.log_dates.append(changed)
+            print(f"Price data version {self.data_version}: {len(changed)} rows appended or revised")
+            return self.data_version
+    
+    def refresh_price_data(self):
+        """Reload the price file if it changed on disk since it was loaded"""
+        if not self.price_source:
+            return
+        with self.reload_lock:
+            try:
+                disk_mtime = os.stat(self.price_source).st_mtime_ns
+            except OSError:
+                return
+            if disk_mtime == self.price_mtime:
+                return
+            
+            records, source, mtime = self.load_price_data([self.price_source])
+            if source is None:
+                # Unreadable file; keep serving what we have until it changes again
+                self.price_mtime = disk_mtime
+                return
+            self.apply_price_updates(records, version=mtime // 1000, replace=True)
+            self.price_mtime = mtime
+    
     def get_price_data(self):
-        return self.price_data
+        self.refresh_price_data()
+        with self.price_lock:
+            return list(self.price_data)
+    
+    def get_price_frame(self, start_date=None, end_date=None):
+        """Price rows as a date-sorted DataFrame, optionally limited to a date range"""
+        df = pd.DataFrame(self.get_price_data())
+        # Ensure date column is datetime
+        df['date'] = pd.to_datetime(df['date'])
+        df = df.sort_values('date')
+        
+        if start_date:
+            df = df[df['date'] >= pd.to_datetime(start_date)]
+        if end_date:
+            df = df[df['date'] <= pd.to_datetime(end_date)]
+        return df.copy()
+    
+    def get_price_snapshot(self):
+        """Price records plus a key that changes whenever they do"""
+        self.refresh_price_data()
+        with self.price_lock:
+            return list(self.price_data), (self.data_epoch, self.data_version)
+    
+    def get_price_delta(self, since_version, epoch=None):
+        """Get rows appended or revised after since_version"""
+        self.refresh_price_data()
+        with self.price_lock:
+            response = {"epoch": self.data_epoch, "version": self.data_version}
+            
+            # Unknown epoch or version means the client must replace its copy
+            if (epoch != self.data_epoch or since_version < self.log_versions[0]
+                    or since_version > self.data_version):
+                response.update({"reset": True, "rows": list(self.price_data)})
+                return response
+            
+            dates = set()
+            for batch in self.log_dates[bisect_right(self.log_versions, since_version):]:
+                dates.update(batch)
+            
+            rows = [self.price_data[self.price_index[d]] for d in sorted(dates)]
+            response.update({"reset": False, "rows": rows})
+            return response
     
     def filter_by_date(self, start_date, end_date):
         """Filter price data by date range"""
         try:
-            df = pd.DataFrame(self.price_data)
-            # Ensure date column is datetime
-            df['date'] = pd.to_datetime(df['date'])
-            
-            # Parse input dates
-            start_dt = pd.to_datetime(start_date)
-            end_dt = pd.to_datetime(end_date)
-            
-            mask = (df['date'] >= start_dt) & (df['date'] <= end_dt)
-            filtered_df = df[mask].copy()
+            filtered_df = self.get_price_frame(start_date, end_date)
             
             # Format dates for JSON serialization
             filtered_df['date'] = filtered_df['date'].dt.strftime('%Y-%m-%d')
@@ -367,23 +549,36 @@ class DataHandler:
     def get_change_points(self):
         return self.change_points_data
     
-    def get_events(self):
-        return self.events_data
+    def get_event(self, event_id):
+        return self.event_store.get(event_id)
+    
+    def get_change_point_for_event(self, event_id):
+        return self.change_point_by_event.get(int(event_id))
+    
+    def count_events(self):
+        return len(self.event_store)
+    
+    def count_change_points(self):
+        return len(self.change_points_data)
+    
+    def get_events(self, start_date=None, end_date=None, event_type=None, region=None):
+        """Get events, optionally filtered by date range, type and region"""
+        return self.event_store.query(start_date, end_date, event_type, region)
+    
+    def get_nearest_events(self, date, limit=1, event_type=None, region=None):
+        """Get the events closest in time to a date"""
+        return self.event_store.nearest(date, limit, event_type, region)
     
     def get_event_correlation(self, event_id):
         """Get correlation analysis for specific event"""
         try:
             event_id = int(event_id)
-            event = next((e for e in self.events_data if e['id'] == event_id), None)
+            event = self.get_event(event_id)
             if not event:
                 return {"error": "Event not found"}
             
             # Find corresponding change point
-            change_point = next(
-                (cp for cp in self.change_points_data 
-                 if event_id in cp.get('associated_events', [])),
-                None
-            )
+            change_point = self.get_change_point_for_event(event_id)
             
             # Calculate price impact
             price_analysis = self.calculate_event_impact(event['date'])
@@ -400,9 +595,7 @@ class DataHandler:
     def calculate_volatility(self):
         """Calculate volatility metrics"""
         try:
-            df = pd.DataFrame(self.price_data)
-            df['date'] = pd.to_datetime(df['date'])
-            df = df.sort_values('date')
+            df = self.get_price_frame()
             
             returns = df['log_return'].dropna()
             
@@ -441,32 +634,40 @@ class DataHandler:
             print(f"Error calculating max drawdown: {e}")
             return 0.0
     
+    def get_price_summary(self):
+        """Price count, date range and distribution statistics"""
+        df = self.get_price_frame()
+        price_stats = df['price'].describe()
+        return {
+            "count": len(df),
+            "start": df['date'].min().strftime('%Y-%m-%d'),
+            "end": df['date'].max().strftime('%Y-%m-%d'),
+            "mean": price_stats['mean'],
+            "median": df['price'].median(),
+            "std": price_stats['std'],
+            "min": price_stats['min'],
+            "max": price_stats['max'],
+            "q1": df['price'].quantile(0.25),
+            "q3": df['price'].quantile(0.75)
+        }
+    
     def get_summary_statistics(self):
         """Get summary statistics for the dashboard"""
         try:
-            df = pd.DataFrame(self.price_data)
-            df['date'] = pd.to_datetime(df['date'])
-            df = df.sort_values('date')
-            
-            price_stats = df['price'].describe()
+            summary = self.get_price_summary()
             
             return {
-                "total_days": len(df),
+                "total_days": summary['count'],
                 "date_range": {
-                    "start": df['date'].min().strftime('%Y-%m-%d'),
-                    "end": df['date'].max().strftime('%Y-%m-%d')
+                    "start": summary['start'],
+                    "end": summary['end']
                 },
                 "price_statistics": {
-                    "mean": float(price_stats['mean']),
-                    "median": float(df['price'].median()),
-                    "std": float(price_stats['std']),
-                    "min": float(price_stats['min']),
-                    "max": float(price_stats['max']),
-                    "q1": float(df['price'].quantile(0.25)),
-                    "q3": float(df['price'].quantile(0.75))
+                    key: float(summary[key])
+                    for key in ['mean', 'median', 'std', 'min', 'max', 'q1', 'q3']
                 },
-                "total_change_points": len(self.change_points_data),
-                "total_events": len(self.events_data)
+                "total_change_points": self.count_change_points(),
+                "total_events": self.count_events()
             }
         except Exception as e:
             print(f"Error calculating summary stats: {e}")
@@ -489,18 +690,13 @@ class DataHandler:
     def calculate_event_impact(self, event_date, window_days=30):
         """Calculate price impact around an event"""
         try:
-            df = pd.DataFrame(self.price_data)
-            df['date'] = pd.to_datetime(df['date'])
-            df = df.sort_values('date')
-            
             event_dt = pd.to_datetime(event_date)
             
             # Get prices around event
             start_date = event_dt - timedelta(days=window_days)
             end_date = event_dt + timedelta(days=window_days)
             
-            mask = (df['date'] >= start_date) & (df['date'] <= end_date)
-            event_prices = df[mask].copy()
+            event_prices = self.get_price_frame(start_date, end_date)
             
             if len(event_prices) == 0:
                 return None
@@ -541,4 +737,19 @@ class DataHandler:
     
     def calculate_price_impact(self, event_date, window_days):
         """Calculate price impact (alias for calculate_event_impact)"""
-        return self.calculate_event_impact(event_date, window_days)
\ No newline at end of file
+        return self.calculate_event_impact(event_date, window_days)
+    
+    def run_scenarios(self, args):
+        """Simulate forward price paths; raises ValueError for invalid parameters"""
+        params = self.scenario_engine.parse_params(args)
+        price_data, data_key = self.get_price_snapshot()
+        return self.scenario_engine.run(price_data, self.get_change_points(), params, data_key)
+
+
+def create_data_handler():
+    """Build the data handler for the configured storage backend"""
+    if config.STORAGE_BACKEND == 'sqlite':
+        # sqlalchemy is only needed for the SQLite backend
+        from sqlite_data_handler import SQLiteDataHandler
+        return SQLiteDataHandler(config.SQLITE_PATH)
+    return DataHandler()
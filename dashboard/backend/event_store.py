@@ -0,0 +1,152 @@
+from bisect import bisect_left, bisect_right
+from datetime import timedelta
+import pandas as pd
+from event_schema import load_events_csv, stable_event_id
+
+
+class EventStore:
+    """Date-sorted event collection with type and region indexes"""
+
+    def __init__(self, events):
+        records = [self._normalize(e) for e in events]
+        records.sort(key=lambda e: e['date'])
+
+        # Events without an id get one derived from their date and name
+        for event in records:
+            if event.get('id') is None:
+                event['id'] = stable_event_id(event['date'], event.get('name'))
+
+        self.events = records
+        self.dates = [e['date'] for e in records]
+
+        # Secondary indexes hold positions into self.events, so they stay date-sorted
+        self.by_id = {e['id']: i for i, e in enumerate(records)}
+        self.by_type = {}
+        self.by_region = {}
+        for i, event in enumerate(records):
+            self.by_type.setdefault(self._key(event.get('type')), []).append(i)
+            self.by_region.setdefault(self._key(event.get('region')), []).append(i)
+
+    @classmethod
+    def from_csv(cls, path):
+        """Load events from the structured events CSV"""
+        return cls(load_events_csv(path))
+
+    @staticmethod
+    def _normalize(event):
+        record = dict(event)
+        record['date'] = pd.to_datetime(record['date']).strftime('%Y-%m-%d')
+        if record.get('id') is not None:
+            record['id'] = int(record['id'])
+        return record
+
+    @staticmethod
+    def _key(value):
+        return str(value).strip().lower() if value is not None else None
+
+    @staticmethod
+    def _to_date(value):
+        return pd.to_datetime(value).strftime('%Y-%m-%d')
+
+    def __len__(self):
+        return len(self.events)
+
+    def all(self):
+        return list(self.events)
+
+    def get(self, event_id):
+        pos = self.by_id.get(int(event_id))
+        return self.events[pos] if pos is not None else None
+
+    def _candidates(self, event_type=None, region=None):
+        """Sorted positions matching the type/region filters, or None for no filter"""
+        lists = []
+        if event_type:
+            lists.append(self.by_type.get(self._key(event_type), []))
+        if region:
+            lists.append(self.by_region.get(self._key(region), []))
+        if not lists:
+            return None
+        lists.sort(key=len)
+        positions = lists[0]
+        for other in lists[1:]:
+            other_set = set(other)
+            positions = [p for p in positions if p in other_set]
+        return positions
+
+    def query(self, start=None, end=None, event_type=None, region=None):
+        """Events within [start, end], optionally filtered by type and region"""
+        lo = bisect_left(self.dates, self._to_date(start)) if start else 0
+        hi = bisect_right(self.dates, self._to_date(end)) if end else len(self.dates)
+
+        positions = self._candidates(event_type, region)
+        if positions is None:
+            return self.events[lo:hi]
+
+        # Positions are date-sorted, so the range is another pair of bisections
+        first = bisect_left(positions, lo)
+        last = bisect_left(positions, hi)
+        return [self.events[p] for p in positions[first:last]]
+
+    def nearest(self, date, limit=1, event_type=None, region=None):
+        """The `limit` events closest in time to `date`"""
+        positions = self._candidates(event_type, region)
+        if positions is None:
+            positions = range(len(self.events))
+        if not positions:
+            return []
+
+        target = pd.to_datetime(date)
+        # Positions are date-sorted, so the global insertion point splits them too
+        split = bisect_left(positions, bisect_left(self.dates, self._to_date(target)))
+        left, right = split - 1, split
+        result = []
+
+        # Walk outwards from the insertion point, taking the closer side each step
+        while len(result) < limit and (left >= 0 or right < len(positions)):
+            if right >= len(positions):
+                take_left = True
+            elif left < 0:
+                take_left = False
+            else:
+                left_gap = target - pd.to_datetime(self.dates[positions[left]])
+                right_gap = pd.to_datetime(self.dates[positions[right]]) - target
+                take_left = left_gap <= right_gap
+            if take_left:
+                result.append(self.events[positions[left]])
+                left -= 1
+            else:
+                result.append(self.events[positions[right]])
+                right += 1
+
+        return result
+
+    def match_change_points(self, change_points, tolerance_days):
+        """Attach every event within `tolerance_days` of each change point.
+
+        Change points are sorted once and merged against the sorted event
+        dates, so the cost is linear in events plus change points plus matches.
+        Returns new change point dicts with `associated_events` filled in.
+        """
+        tolerance = timedelta(days=tolerance_days)
+        ordered = sorted(change_points, key=lambda cp: pd.to_datetime(cp['date']))
+        matched = []
+        lo = 0
+
+        for cp in ordered:
+            cp_date = pd.to_datetime(cp['date'])
+            window_start = (cp_date - tolerance).strftime('%Y-%m-%d')
+            window_end = (cp_date + tolerance).strftime('%Y-%m-%d')
+
+            # Window starts only move forward, so `lo` never rewinds
+            while lo < len(self.dates) and self.dates[lo] < window_start:
+                lo += 1
+            hi = lo
+            while hi < len(self.dates) and self.dates[hi] <= window_end:
+                hi += 1
+
+            record = dict(cp)
+            record['associated_events'] = [e['id'] for e in self.events[lo:hi]]
+            matched.append(record)
+
+        return matched
@@ -0,0 +1,250 @@
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import atexit
+import math
+import multiprocessing
+import threading
+import numpy as np
+import pandas as pd
+import config
+
+METHODS = ('bootstrap', 'gbm')
+REGIMES = ('current', 'all')
+PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def simulate_chunk(task):
+    """Simulate one chunk of paths and return log price changes at the sampled steps.
+
+    Runs in a worker process, so it only takes plain arrays and numbers.
+    The result is a (paths, len(steps)) float32 array. Only the sampled
+    steps are materialized, never the full (paths, horizon) matrix.
+    """
+    rng = np.random.default_rng(task['seed'])
+    paths = task['paths']
+    steps = task['steps']
+
+    if task['method'] == 'bootstrap':
+        # Each path is a run of whole blocks starting at boundary-safe offsets.
+        # Prefix sums turn every block (and partial block) into one subtraction.
+        prefix = task['prefix']
+        block_size = task['block_size']
+        n_blocks = -(-task['horizon'] // block_size)
+        starts = rng.choice(task['block_starts'], size=(paths, n_blocks))
+        block_sums = prefix[starts + block_size] - prefix[starts]
+        completed = np.zeros((paths, n_blocks + 1))
+        np.cumsum(block_sums, axis=1, out=completed[:, 1:])
+
+        full, rem = np.divmod(steps, block_size)
+        partial_starts = starts[:, np.minimum(full, n_blocks - 1)]
+        partial = np.where(rem > 0, prefix[partial_starts + rem] - prefix[partial_starts], 0.0)
+        result = completed[:, full] + partial
+    else:
+        # Brownian increments between sampled steps are exact in distribution
+        sigma = task['sigma']
+        gaps = np.diff(steps, prepend=0)
+        drift = (task['drift'] - 0.5 * sigma ** 2) * gaps
+        shocks = rng.standard_normal((paths, len(steps))) * (sigma * np.sqrt(gaps))
+        result = np.cumsum(drift + shocks, axis=1)
+
+    return result.astype(np.float32)
+
+
+def warm_worker():
+    """No-op run once per worker at startup, so worker start-up is not paid by a request."""
+    return None
+
+
+class ScenarioEngine:
+    """Forward Brent price paths by regime-aware block bootstrap or GBM"""
+
+    def __init__(self, workers=None, chunk_paths=None, cache_size=None):
+        self.workers = workers or config.SCENARIO_WORKERS
+        self.chunk_paths = chunk_paths or config.SCENARIO_CHUNK_PATHS
+        self.cache_size = cache_size or config.SCENARIO_CACHE_SIZE
+        self.cache = OrderedDict()
+        self.cache_lock = threading.Lock()
+        self.executor = None
+        if self.workers > 1:
+            # Workers come from a forkserver (or spawn), never from forking
+            # this multi-threaded server process
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+            self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+            atexit.register(self.shutdown)
+            # Workers only start on submit; start them all now rather than on the first request
+            for future in [self.executor.submit(warm_worker) for _ in range(self.workers)]:
+                future.result()
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+
+    def parse_params(self, args):
+        """Validate request parameters, raising ValueError on bad input"""
+        params = {
+            'method': args.get('method', 'bootstrap'),
+            'paths': int(args.get('paths', 10000)),
+            'horizon': int(args.get('horizon', 252)),
+            'block_size': int(args.get('block_size', 20)),
+            'regime': args.get('regime', 'current'),
+            'drift': float(args.get('drift', 0.0)),
+            'points': int(args.get('points', 53)),
+            'seed': int(args.get('seed', 42)),
+        }
+        if params['method'] not in METHODS:
+            raise ValueError(f"method must be one of {', '.join(METHODS)}")
+        if params['regime'] not in REGIMES:
+            raise ValueError(f"regime must be one of {', '.join(REGIMES)}")
+        if not 1 <= params['paths'] <= config.SCENARIO_MAX_PATHS:
+            raise ValueError(f"paths must be between 1 and {config.SCENARIO_MAX_PATHS}")
+        if not 1 <= params['horizon'] <= config.SCENARIO_MAX_HORIZON_DAYS:
+            raise ValueError(f"horizon must be between 1 and {config.SCENARIO_MAX_HORIZON_DAYS}")
+        if params['block_size'] < 1:
+            raise ValueError("block_size must be positive")
+        if params['points'] < 2:
+            raise ValueError("points must be at least 2")
+        if not math.isfinite(params['drift']):
+            raise ValueError("drift must be a finite number")
+
+        # Drop options the method ignores so they don't split the result cache
+        if params['method'] == 'bootstrap':
+            del params['drift']
+        else:
+            del params['block_size'], params['regime']
+        return params
+
+    def run(self, price_data, change_points, params, data_key=None):
+        """Simulate paths and summarize them as a percentile fan chart.
+
+        Results are cached per parameter set and data_key, so callers should
+        pass something that changes whenever price_data does.
+        """
+        result = self.cached(params, data_key)
+        if result is not None:
+            return result
+
+        result = self.simulate(price_data, change_points, params)
+
+        with self.cache_lock:
+            self.cache[(data_key, tuple(sorted(params.items())))] = result
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return result
+
+    def cached(self, params, data_key):
+        """Cached result for params and data_key, or None"""
+        cache_key = (data_key, tuple(sorted(params.items())))
+        with self.cache_lock:
+            if cache_key in self.cache:
+                self.cache.move_to_end(cache_key)
+                return self.cache[cache_key]
+        return None
+
+    def regime_boundaries(self, dates, change_points):
+        """Row positions where each regime starts, including 0"""
+        cp_dates = sorted(pd.to_datetime(cp['date']) for cp in change_points)
+        positions = np.searchsorted(dates.values, np.array(cp_dates, dtype='datetime64[ns]'))
+        return np.unique(np.concatenate([[0], positions[(positions > 0) & (positions < len(dates))]]))
+
+    def simulate(self, price_data, change_points, params):
+        df = pd.DataFrame(price_data)
+        df['date'] = pd.to_datetime(df['date'])
+        df = df.sort_values('date').dropna(subset=['log_return']).reset_index(drop=True)
+        if len(df) < 2:
+            raise ValueError("Not enough price data to simulate")
+
+        returns = df['log_return'].values.astype(np.float64)
+        boundaries = self.regime_boundaries(df['date'], change_points)
+        regime_start = int(boundaries[-1])
+
+        horizon = params['horizon']
+        steps = np.unique(np.linspace(1, horizon, min(params['points'], horizon)).round().astype(int))
+
+        task = {
+            'method': params['method'],
+            'horizon': horizon,
+            'steps': steps,
+        }
+        if params['method'] == 'bootstrap':
+            block_size = params['block_size']
+            task['block_size'] = block_size
+            task['prefix'] = np.concatenate([[0.0], np.cumsum(returns)])
+            task['block_starts'] = self.block_starts(boundaries, len(returns), block_size, params['regime'])
+        else:
+            # Current rolling volatility, matching calculate_volatility's 30-day window
+            task['sigma'] = float(df['log_return'].rolling(window=30).std().iloc[-1])
+            if not math.isfinite(task['sigma']):
+                raise ValueError("Not enough price data to estimate volatility (need 30 returns)")
+            task['drift'] = params['drift'] / 252
+
+        chunks = self.split_paths(params['paths'])
+        seeds = np.random.SeedSequence(params['seed']).spawn(len(chunks))
+        tasks = [dict(task, paths=n, seed=s) for n, s in zip(chunks, seeds)]
+
+        if len(tasks) == 1 or self.executor is None:
+            outputs = [simulate_chunk(t) for t in tasks]
+        else:
+            outputs = list(self.executor.map(simulate_chunk, tasks))
+        # One contiguous row per step keeps the percentile partitions cache-friendly
+        log_changes = np.concatenate(outputs).T.copy()
+
+        start_price = float(df['price'].iloc[-1])
+        price_paths = start_price * np.exp(log_changes)
+        bands = np.percentile(price_paths, PERCENTILES, axis=1)
+        means = price_paths.mean(axis=1)
+        # NaN or inf would be emitted as invalid JSON
+        if not (np.isfinite(bands).all() and np.isfinite(means).all()):
+            raise ValueError("Simulated prices overflowed; reduce drift or horizon")
+
+        future_dates = pd.bdate_range(df['date'].iloc[-1] + pd.Timedelta(days=1), periods=horizon)
+        fan_chart = [{"step": 0, "date": df['date'].iloc[-1].strftime('%Y-%m-%d'), "mean": start_price,
+                      **{f"p{p}": start_price for p in PERCENTILES}}]
+        for i, step in enumerate(steps):
+            point = {
+                "step": int(step),
+                "date": future_dates[step - 1].strftime('%Y-%m-%d'),
+                "mean": float(means[i])
+            }
+            for j, p in enumerate(PERCENTILES):
+                point[f"p{p}"] = float(bands[j, i])
+            fan_chart.append(point)
+
+        result = {
+            "method": params['method'],
+            "paths": params['paths'],
+            "horizon_days": horizon,
+            "start_date": df['date'].iloc[-1].strftime('%Y-%m-%d'),
+            "start_price": start_price,
+            "regime_start": df['date'].iloc[regime_start].strftime('%Y-%m-%d'),
+            "percentiles": list(PERCENTILES),
+            "fan_chart": fan_chart
+        }
+        if params['method'] == 'bootstrap':
+            result["block_size"] = params['block_size']
+            result["regime"] = params['regime']
+        else:
+            result["daily_volatility"] = task['sigma']
+            result["annualized_drift"] = params['drift']
+        return result
+
+    def block_starts(self, boundaries, n_returns, block_size, regime):
+        """Block start offsets whose blocks stay inside a single regime"""
+        ends = np.append(boundaries[1:], n_returns)
+        segments = list(zip(boundaries, ends))
+        if regime == 'current':
+            segments = segments[-1:]
+
+        starts = [np.arange(s, e - block_size + 1) for s, e in segments if e - s >= block_size]
+        if not starts and regime == 'current':
+            # Current regime is shorter than one block; fall back to all regimes
+            return self.block_starts(boundaries, n_returns, block_size, 'all')
+        if not starts:
+            raise ValueError("block_size is longer than every regime")
+        return np.concatenate(starts)
+
+    def split_paths(self, paths):
+        """Split the path count into chunks of at most chunk_paths"""
+        full, rest = divmod(paths, self.chunk_paths)
+        return [self.chunk_paths] * full + ([rest] if rest else [])
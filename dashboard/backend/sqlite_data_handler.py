@@ -0,0 +1,78 @@
+import pandas as pd
+import config
+from data_handler import DataHandler
+from scenarios import ScenarioEngine
+from sqlite_store import SQLiteStore
+
+class SQLiteDataHandler(DataHandler):
+    """DataHandler that reads from the SQLite store instead of memory.
+
+    Range filters, aggregates and event lookups run in SQL, and new data
+    written by the offline pipeline is visible on the next request.
+    """
+
+    def __init__(self, db_path):
+        print(f"Using SQLite storage: {db_path}")
+        self.store = SQLiteStore(db_path, read_only=True, pool_size=config.SQLITE_POOL_SIZE)
+        self.series = config.PRICE_SERIES
+        self.tolerance_days = config.EVENT_MATCH_TOLERANCE_DAYS
+        self.scenario_engine = ScenarioEngine()
+
+    def refresh_price_data(self):
+        # Every query reads the database directly, so there is nothing to reload
+        pass
+
+    def get_price_data(self):
+        return self.store.price_records(self.series)
+
+    def get_price_frame(self, start_date=None, end_date=None):
+        df = self.store.price_frame(self.series, start_date, end_date)
+        df['date'] = pd.to_datetime(df['date'])
+        return df
+
+    def get_price_snapshot(self):
+        # Rows and version come from one read, so the key always matches the rows
+        data_key, rows = self.store.price_delta(0, self.series)
+        return rows, data_key
+
+    def run_scenarios(self, args):
+        """Simulate forward price paths; raises ValueError for invalid parameters"""
+        params = self.scenario_engine.parse_params(args)
+        # A cache hit needs only the data version, not the prices table
+        result = self.scenario_engine.cached(params, self.store.get_version())
+        if result is not None:
+            return result
+        price_data, data_key = self.get_price_snapshot()
+        return self.scenario_engine.run(price_data, self.get_change_points(), params, data_key)
+
+    def get_price_delta(self, since_version, epoch=None):
+        """Get rows appended or revised after since_version"""
+        data_epoch, data_version = self.store.get_version()
+        # Unknown epoch or version means the client must replace its copy
+        reset = epoch != data_epoch or since_version < 1 or since_version > data_version
+        (data_epoch, data_version), rows = self.store.price_delta(0 if reset else since_version, self.series)
+        return {"epoch": data_epoch, "version": data_version, "reset": reset, "rows": rows}
+
+    def get_price_summary(self):
+        return self.store.price_summary(self.series)
+
+    def get_change_points(self):
+        return self.store.change_points(self.tolerance_days)
+
+    def get_events(self, start_date=None, end_date=None, event_type=None, region=None):
+        return self.store.events(start_date, end_date, event_type, region)
+
+    def get_nearest_events(self, date, limit=1, event_type=None, region=None):
+        return self.store.nearest_events(date, limit, event_type, region)
+
+    def get_event(self, event_id):
+        return self.store.event(event_id)
+
+    def get_change_point_for_event(self, event_id):
+        return self.store.change_point_for_event(event_id, self.tolerance_days)
+
+    def count_events(self):
+        return self.store.event_count()
+
+    def count_change_points(self):
+        return self.store.change_point_count()
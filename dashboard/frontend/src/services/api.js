@@ -9,10 +9,56 @@ const api = axios.create({
   },
 });
 
-export const fetchPrices = async () => {
+// Local copy of the price history, kept current with delta fetches
+let priceCache = { epoch: null, version: 0, rows: [] };
+
+export const mergePriceDelta = (cache, delta) => {
+  if (delta.reset) {
+    return { epoch: delta.epoch, version: delta.version, rows: delta.rows };
+  }
+  if (delta.rows.length === 0) {
+    return { ...cache, version: delta.version };
+  }
+
+  const positions = new Map(cache.rows.map((row, i) => [row.date, i]));
+  const rows = cache.rows.slice();
+  let needsSort = false;
+  delta.rows.forEach((row) => {
+    const position = positions.get(row.date);
+    if (position !== undefined) {
+      rows[position] = row;
+    } else {
+      if (rows.length > 0 && row.date < rows[rows.length - 1].date) {
+        needsSort = true;
+      }
+      positions.set(row.date, rows.length);
+      rows.push(row);
+    }
+  });
+  if (needsSort) {
+    rows.sort((a, b) => (a.date < b.date ? -1 : a.date > b.date ? 1 : 0));
+  }
+
+  return { epoch: delta.epoch, version: delta.version, rows };
+};
+
+export const fetchPriceDelta = async (sinceVersion, epoch) => {
   try {
-    const response = await api.get('/prices');
+    const response = await api.get('/prices', {
+      params: { since_version: sinceVersion, epoch: epoch || undefined }
+    });
     return response.data;
+  } catch (error) {
+    console.error('Error fetching price delta:', error);
+    throw error;
+  }
+};
+
+export const fetchPrices = async () => {
+  try {
+    const delta = await fetchPriceDelta(priceCache.version, priceCache.epoch);
+    priceCache = mergePriceDelta(priceCache, delta);
+    return priceCache.rows;
   } catch (error) {
     console.error('Error fetching prices:', error);
     throw error;
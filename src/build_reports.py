@@ -0,0 +1,381 @@
+"""
+Report figure builder for Brent oil price analysis.
+
+Each figure declares the inputs it reads. A figure is only re-rendered
+when the content of one of its inputs (or its render function) changes,
+and each render runs in a worker process.
+
+Usage:
+    python build_reports.py [--force] [--workers N] [figure ...]
+"""
+
+import argparse
+import atexit
+import hashlib
+import inspect
+import json
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-process lock applies
+    fcntl = None
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPORTS_DIR = os.path.join(PROJECT_ROOT, 'reports')
+MANIFEST_NAME = '.manifest.json'
+LOCK_NAME = '.manifest.lock'
+
+INPUT_PATHS = {
+    'processed_data': os.path.join(PROJECT_ROOT, 'data', 'processed', 'brent_oil_processed.csv'),
+    'change_points': os.path.join(PROJECT_ROOT, 'data', 'processed', 'change_point_results.json'),
+    'events': os.path.join(PROJECT_ROOT, 'data', 'events', 'key_events_correct.csv'),
+}
+
+
+def load_processed_data(path):
+    """Load processed prices, deriving any feature columns that are missing."""
+    df = pd.read_csv(path, parse_dates=['Date']).sort_values('Date').reset_index(drop=True)
+    if 'Log_Return' not in df.columns:
+        df['Log_Return'] = np.log(df['Price']/df['Price'].shift(1))
+    if 'Rolling_Mean_30' not in df.columns:
+        df['Rolling_Mean_30'] = df['Price'].rolling(window=30).mean()
+    return df
+
+
+def load_change_points(path):
+    """Load change point dates from the analysis results JSON."""
+    with open(path) as f:
+        results = json.load(f)
+    return [pd.to_datetime(cp['date']) for cp in results.get('change_points', [])]
+
+
+def load_events(path):
+    """Load events from the structured events CSV."""
+    return pd.read_csv(path, parse_dates=['date']).sort_values('date')
+
+
+INPUT_LOADERS = {
+    'processed_data': load_processed_data,
+    'change_points': load_change_points,
+    'events': load_events,
+}
+
+
+def render_price_analysis(data):
+    df = data['processed_data']
+    fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(14, 9))
+    ax1.plot(df['Date'], df['Price'], linewidth=0.8, label='Price')
+    ax1.plot(df['Date'], df['Rolling_Mean_30'], linewidth=1.2, label='30-day mean')
+    ax1.set_title('Brent Oil Price')
+    ax1.set_ylabel('USD/barrel')
+    ax1.legend()
+    ax2.hist(df['Log_Return'].dropna(), bins=100)
+    ax2.set_title('Distribution of Daily Log Returns')
+    ax2.set_xlabel('Log return')
+    return fig
+
+
+def render_volatility_analysis(data):
+    df = data['processed_data']
+    annualized = df['Log_Return'].rolling(window=30).std() * np.sqrt(252) * 100
+    fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(14, 9), sharex=True)
+    ax1.plot(df['Date'], df['Log_Return'], linewidth=0.5)
+    ax1.set_title('Daily Log Returns')
+    ax2.plot(df['Date'], annualized, linewidth=0.8, color='tab:red')
+    ax2.set_title('30-day Rolling Volatility (annualized)')
+    ax2.set_ylabel('%')
+    return fig
+
+
+def render_trend_analysis(data):
+    df = data['processed_data']
+    yearly = df.groupby(df['Date'].dt.year)['Price'].mean()
+    fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(14, 9))
+    ax1.plot(df['Date'], df['Price'], linewidth=0.6, alpha=0.6, label='Price')
+    ax1.plot(df['Date'], df['Price'].rolling(window=365).mean(), linewidth=1.5, label='365-day mean')
+    ax1.set_title('Long-term Price Trend')
+    ax1.legend()
+    ax2.bar(yearly.index, yearly.values)
+    ax2.set_title('Average Price by Year')
+    ax2.set_ylabel('USD/barrel')
+    return fig
+
+
+def render_change_points(data):
+    df = data['processed_data']
+    fig, ax = plt.subplots(figsize=(14, 6))
+    ax.plot(df['Date'], df['Price'], linewidth=0.8)
+    for i, cp_date in enumerate(data['change_points']):
+        ax.axvline(cp_date, color='red', linestyle='--', linewidth=1.2,
+                   label='Change point' if i == 0 else None)
+    ax.set_title('Detected Change Points')
+    ax.set_ylabel('USD/barrel')
+    if data['change_points']:
+        ax.legend()
+    return fig
+
+
+def render_price_with_events(data):
+    df = data['processed_data']
+    events = data['events']
+    fig, ax = plt.subplots(figsize=(14, 6))
+    ax.plot(df['Date'], df['Price'], linewidth=0.8)
+    top = df['Price'].max()
+    for _, event in events.iterrows():
+        ax.axvline(event['date'], color='gray', linestyle=':', linewidth=0.8)
+        ax.text(event['date'], top, event['event_name'], rotation=90,
+                fontsize=7, va='top', ha='right')
+    ax.set_title('Brent Oil Price with Key Events')
+    ax.set_ylabel('USD/barrel')
+    return fig
+
+
+class Figure:
+    """A report figure and the inputs it is rendered from."""
+
+    def __init__(self, name, inputs, render):
+        """
+        Initialize figure.
+
+        Args:
+            name (str): Output file name without the .png extension
+            inputs (list): Keys of INPUT_PATHS the figure reads
+            render (callable): Function taking a dict of loaded inputs and
+                returning a matplotlib figure
+        """
+        self.name = name
+        self.inputs = inputs
+        self.render = render
+
+
+FIGURES = [
+    Figure('price_analysis', ['processed_data'], render_price_analysis),
+    Figure('volatility_analysis', ['processed_data'], render_volatility_analysis),
+    Figure('trend_analysis', ['processed_data'], render_trend_analysis),
+    Figure('change_points_analysis_final', ['processed_data', 'change_points'], render_change_points),
+    Figure('price_with_events', ['processed_data', 'events'], render_price_with_events),
+]
+
+
+def render_figure(name, input_paths, output_path):
+    """Render one figure to output_path. Runs in a worker process."""
+    figure = next(f for f in FIGURES if f.name == name)
+    data = {key: INPUT_LOADERS[key](input_paths[key]) for key in figure.inputs}
+    fig = figure.render(data)
+    fig.tight_layout()
+    # Readers never see a half-written PNG: write aside, then swap it in
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    try:
+        fig.savefig(tmp_path, dpi=150, format='png')
+        os.replace(tmp_path, output_path)
+    finally:
+        plt.close(fig)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return name
+
+
+class ReportBuilder:
+    """Render report figures, skipping those whose inputs are unchanged."""
+
+    def __init__(self, reports_dir=REPORTS_DIR, input_paths=None, workers=None):
+        """
+        Initialize builder.
+
+        Args:
+            reports_dir (str): Directory the PNGs and cache manifest live in
+            input_paths (dict): Overrides for INPUT_PATHS
+            workers (int): Worker processes, defaults to one per CPU
+        """
+        self.reports_dir = reports_dir
+        self.input_paths = dict(INPUT_PATHS, **(input_paths or {}))
+        self.workers = workers
+        self.figures = {f.name: f for f in FIGURES}
+        self.manifest_path = os.path.join(reports_dir, MANIFEST_NAME)
+        self.lock_path = os.path.join(reports_dir, LOCK_NAME)
+        self.lock = threading.Lock()
+        # Input path -> ((mtime_ns, size), sha256) of the last hash taken
+        self.hash_cache = {}
+
+        # One pool for the builder's lifetime. Workers come from a forkserver
+        # (or spawn), so they are never forked from a threaded server.
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+        self.executor = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+        atexit.register(self.shutdown)
+
+    def shutdown(self):
+        self.executor.shutdown(cancel_futures=True)
+
+    @contextmanager
+    def manifest_lock(self):
+        """Serialize manifest and figure updates across threads and processes."""
+        with self.lock:
+            if fcntl is None:
+                yield
+                return
+            os.makedirs(self.reports_dir, exist_ok=True)
+            with open(self.lock_path, 'w') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def output_path(self, name):
+        return os.path.join(self.reports_dir, f"{name}.png")
+
+    def hash_file(self, path):
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def figure_key(self, figure, input_hashes):
+        """Content hash of a figure's inputs and render code, or None if an input is missing."""
+        if any(input_hashes.get(key) is None for key in figure.inputs):
+            return None
+        parts = [figure.name, inspect.getsource(figure.render)]
+        parts += [f"{key}={input_hashes[key]}" for key in figure.inputs]
+        return hashlib.sha256('\n'.join(parts).encode()).hexdigest()
+
+    def input_hashes(self, keys):
+        hashes = {}
+        for key in keys:
+            path = self.input_paths[key]
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                hashes[key] = None
+                continue
+            # Only re-read a file whose mtime or size has moved since the last hash
+            stamp = (st.st_mtime_ns, st.st_size)
+            cached = self.hash_cache.get(path)
+            if cached is None or cached[0] != stamp:
+                cached = (stamp, self.hash_file(path))
+                self.hash_cache[path] = cached
+            hashes[key] = cached[1]
+        return hashes
+
+    def load_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return {}
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_manifest(self, manifest):
+        os.makedirs(self.reports_dir, exist_ok=True)
+        tmp_path = f"{self.manifest_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+    def build(self, names=None, force=False):
+        """
+        Render stale figures in parallel.
+
+        Args:
+            names (list): Figures to build, defaults to all
+            force (bool): Re-render even if the cache is current
+
+        Returns:
+            dict: Figure name to 'cached', 'rendered', 'missing inputs' or an error
+        """
+        names = names or list(self.figures)
+        unknown = [n for n in names if n not in self.figures]
+        if unknown:
+            raise ValueError(f"Unknown figures: {', '.join(unknown)}")
+
+        figures = [self.figures[n] for n in names]
+        hashes = self.input_hashes({key for f in figures for key in f.inputs})
+        manifest = self.load_manifest()
+        status, pending = {}, {}
+
+        for figure in figures:
+            key = self.figure_key(figure, hashes)
+            if key is None:
+                status[figure.name] = 'missing inputs'
+            elif not force and manifest.get(figure.name) == key and os.path.exists(self.output_path(figure.name)):
+                status[figure.name] = 'cached'
+            else:
+                pending[figure.name] = key
+
+        if pending:
+            os.makedirs(self.reports_dir, exist_ok=True)
+            futures = {
+                name: self.executor.submit(render_figure, name, self.input_paths, self.output_path(name))
+                for name in pending
+            }
+            rendered = {}
+            for name, future in futures.items():
+                try:
+                    future.result()
+                    rendered[name] = pending[name]
+                    status[name] = 'rendered'
+                except Exception as e:
+                    rendered[name] = None
+                    status[name] = f"failed: {e}"
+            # Re-read under the lock so concurrent updates to other figures are kept
+            with self.manifest_lock():
+                manifest = self.load_manifest()
+                for name, key in rendered.items():
+                    if key is None:
+                        manifest.pop(name, None)
+                    else:
+                        manifest[name] = key
+                self.save_manifest(manifest)
+
+        return status
+
+    def get_figure(self, name):
+        """
+        Return the path of an up-to-date figure, rendering it in-process if stale.
+
+        Returns None when the figure's inputs are missing.
+        """
+        if name not in self.figures:
+            raise ValueError(f"Unknown figure: {name}")
+
+        figure = self.figures[name]
+        key = self.figure_key(figure, self.input_hashes(figure.inputs))
+        if key is None:
+            return None
+
+        path = self.output_path(name)
+        # Concurrent requests for a stale figure wait here for one render
+        with self.manifest_lock():
+            manifest = self.load_manifest()
+            if manifest.get(name) != key or not os.path.exists(path):
+                # pyplot is not thread-safe, so render in a worker even for one figure
+                self.executor.submit(render_figure, name, self.input_paths, path).result()
+                manifest[name] = key
+                self.save_manifest(manifest)
+        return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build report figures.")
+    parser.add_argument('figures', nargs='*', help="Figures to build (default: all)")
+    parser.add_argument('--force', action='store_true', help="Re-render even if cached")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes")
+    args = parser.parse_args()
+
+    builder = ReportBuilder(workers=args.workers)
+    for name, result in builder.build(args.figures, force=args.force).items():
+        print(f"{name}: {result}")
@@ -0,0 +1,75 @@
+"""
+Shared schema for the change point results JSON written by the analysis.
+
+The dashboard API (in memory or SQLite) serves change points with the
+fields date, probability, before_mean, after_mean and change_percentage,
+where the means are prices in USD/barrel. The results JSON describes each
+regime by its returns, so the price means are derived from the price
+series. This module maps results records onto that shape.
+"""
+
+import json
+
+import pandas as pd
+
+
+def load_change_point_json(path):
+    """Read change points from an analysis results JSON."""
+    with open(path) as f:
+        results = json.load(f)
+    return results.get('change_points', results) if isinstance(results, dict) else results
+
+
+def to_api_change_points(change_points, prices):
+    """
+    Add the API fields to change point records.
+
+    Each change point's before/after means are the average prices of the
+    regimes on either side of it, bounded by the neighbouring change points.
+    Records that already carry the API fields are returned unchanged.
+
+    Args:
+        change_points (list): Change point records with at least a date
+        prices (pd.DataFrame): Price rows with date and price columns
+
+    Returns:
+        list: Change point records in date order
+    """
+    records = sorted(change_points, key=lambda cp: pd.to_datetime(cp['date']))
+    dates = pd.to_datetime(prices['date']) if len(prices) else pd.Series(dtype='datetime64[ns]')
+    values = prices['price'] if len(prices) else pd.Series(dtype=float)
+
+    def mean_price(start, end):
+        mask = pd.Series(True, index=dates.index)
+        if start is not None:
+            mask &= dates >= start
+        if end is not None:
+            mask &= dates < end
+        mean = values[mask].mean()
+        return None if pd.isna(mean) else round(float(mean), 2)
+
+    result = []
+    for i, cp in enumerate(records):
+        if 'before_mean' in cp:
+            result.append(cp)
+            continue
+
+        date = pd.to_datetime(cp['date'])
+        previous = pd.to_datetime(records[i - 1]['date']) if i > 0 else None
+        following = pd.to_datetime(records[i + 1]['date']) if i + 1 < len(records) else None
+        before_mean = mean_price(previous, date)
+        after_mean = mean_price(date, following)
+
+        p_value = cp.get('statistical_significance', {}).get('p_value')
+        record = dict(cp)
+        record.update({
+            'date': date.strftime('%Y-%m-%d'),
+            'probability': None if p_value is None else round(1 - float(p_value), 4),
+            'before_mean': before_mean,
+            'after_mean': after_mean,
+            'change_percentage': (
+                round((after_mean / before_mean - 1) * 100, 1) if before_mean and after_mean is not None else None
+            ),
+        })
+        result.append(record)
+    return result
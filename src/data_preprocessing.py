@@ -5,22 +5,193 @@ Data preprocessing module for Brent oil price analysis.
 import pandas as pd
 import numpy as np
 from datetime import datetime
+import glob
+import hashlib
+import inspect
+import json
+import os
 import warnings
 warnings.filterwarnings('ignore')
 
 
+class Feature:
+    """A group of derived columns and the history needed to compute them."""
+    
+    def __init__(self, name, lookback, compute):
+        """
+        Initialize feature.
+        
+        Args:
+            name (str): Feature group name
+            lookback (int): Number of preceding rows each output row depends on
+            compute (callable): Function taking a frame with Date and Price
+                columns and returning a frame of new columns on the same index
+        """
+        self.name = name
+        self.lookback = lookback
+        self.compute = compute
+
+
+def calendar_features(df):
+    """Time-based features."""
+    return pd.DataFrame({
+        'Year': df['Date'].dt.year,
+        'Month': df['Date'].dt.month,
+        'Quarter': df['Date'].dt.quarter,
+        'DayOfWeek': df['Date'].dt.dayofweek
+    }, index=df.index)
+
+
+def return_features(df):
+    """Simple and log returns."""
+    return pd.DataFrame({
+        'Daily_Return': df['Price'].pct_change(),
+        # Same expression as the dashboard and SQLite loaders, so stored returns match bit for bit
+        'Log_Return': np.log(df['Price']) - np.log(df['Price'].shift(1))
+    }, index=df.index)
+
+
+def rolling_features(df):
+    """30-day rolling statistics."""
+    return pd.DataFrame({
+        'Rolling_Mean_30': df['Price'].rolling(window=30).mean(),
+        'Rolling_Std_30': df['Price'].rolling(window=30).std()
+    }, index=df.index)
+
+
+FEATURES = [
+    Feature('calendar', 0, calendar_features),
+    Feature('returns', 1, return_features),
+    Feature('rolling_30', 29, rolling_features),
+]
+
+
+class FeaturePipeline:
+    """Compute features incrementally, caching results on disk."""
+    
+    INPUT_COLUMNS = ['Date', 'Price']
+    
+    def __init__(self, features=None, cache_dir=None):
+        """
+        Initialize pipeline.
+        
+        Args:
+            features (list): Feature definitions, defaults to FEATURES
+            cache_dir (str): Directory for cached features, None disables caching
+        """
+        self.features = features if features is not None else FEATURES
+        self.cache_dir = cache_dir
+    
+    def run(self, df, cache_name='features'):
+        """
+        Return df with all feature columns added.
+        
+        If a cached result was computed from a prefix of df, only the new
+        rows (plus each feature's lookback) are recomputed. Any change to
+        the cached rows triggers a full recompute.
+        
+        Args:
+            df (pd.DataFrame): Input sorted by Date with Date and Price columns
+            cache_name (str): Name distinguishing caches of different inputs
+        """
+        df = df.reset_index(drop=True)
+        if self.cache_dir is None:
+            return self._attach(df, self._compute(df, 0))
+        
+        cache_path = self._cache_path(cache_name)
+        cached, start = None, 0
+        entry = self._load_cache(cache_path)
+        if entry is not None:
+            rows = entry['rows']
+            if (rows <= len(df) and len(entry['features']) >= rows
+                    and self._hash_rows(df, rows) == entry['input_hash']):
+                cached = entry['features'].iloc[:rows]
+                start = rows
+        
+        if cached is not None and start == len(df):
+            print(f"Features up to date ({start} cached rows)")
+            features = cached
+        else:
+            print(f"Computing features for {len(df) - start} new rows ({start} cached rows)")
+            new_features = self._compute(df, start)
+            features = new_features if cached is None else pd.concat([cached, new_features])
+            self._save_cache(features, df, cache_path, cache_name)
+        
+        return self._attach(df, features)
+    
+    def _attach(self, df, features):
+        """Join features onto df, replacing any stale feature columns."""
+        if len(features) != len(df) or not features.index.equals(df.index):
+            raise ValueError(f"Feature rows ({len(features)}) do not match input rows ({len(df)}).")
+        return df.drop(columns=[c for c in features.columns if c in df.columns]).join(features)
+    
+    def _compute(self, df, start):
+        """Compute features for rows start onwards, reading back each feature's lookback."""
+        outputs = []
+        for feature in self.features:
+            window_start = max(0, start - feature.lookback)
+            window = df.iloc[window_start:][self.INPUT_COLUMNS]
+            outputs.append(feature.compute(window).iloc[start - window_start:])
+        return pd.concat(outputs, axis=1)
+    
+    def _cache_prefix(self, cache_name):
+        return hashlib.sha256(cache_name.encode()).hexdigest()[:16]
+    
+    def _cache_path(self, cache_name):
+        # Feature code is part of the key, so editing a feature invalidates its cache
+        spec = json.dumps([(f.name, f.lookback, inspect.getsource(f.compute)) for f in self.features])
+        key = hashlib.sha256(spec.encode()).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"{self._cache_prefix(cache_name)}-{key}.pkl")
+    
+    def _hash_rows(self, df, rows):
+        row_hashes = pd.util.hash_pandas_object(df[self.INPUT_COLUMNS].iloc[:rows], index=False)
+        return hashlib.sha256(row_hashes.values.tobytes()).hexdigest()
+    
+    def _load_cache(self, cache_path):
+        if not os.path.exists(cache_path):
+            return None
+        try:
+            return pd.read_pickle(cache_path)
+        except Exception as e:
+            print(f"Ignoring unreadable feature cache {cache_path}: {e}")
+            return None
+    
+    def _save_cache(self, features, df, cache_path, cache_name):
+        # Features and their metadata go in one file, replaced atomically
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entry = {
+            'rows': len(df),
+            'input_hash': self._hash_rows(df, len(df)),
+            'features': features
+        }
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        pd.to_pickle(entry, tmp_path)
+        os.replace(tmp_path, cache_path)
+        
+        # Caches of this input built by older feature code can never be hit again
+        pattern = os.path.join(self.cache_dir, f"{self._cache_prefix(cache_name)}-*.pkl")
+        for stale_path in glob.glob(pattern):
+            if stale_path != cache_path:
+                try:
+                    os.remove(stale_path)
+                except OSError:
+                    pass
+
+
 class DataPreprocessor:
     """Preprocess Brent oil price data."""
     
-    def __init__(self, filepath):
+    def __init__(self, filepath, cache_dir=None):
         """
         Initialize preprocessor.
         
         Args:
             filepath (str): Path to raw data CSV file
+            cache_dir (str): Directory for cached features, None disables caching
         """
         self.filepath = filepath
         self.df = None
+        self.pipeline = FeaturePipeline(cache_dir=cache_dir)
         
     def load_data(self):
         """Load and clean raw data."""
@@ -43,19 +214,7 @@ class DataPreprocessor:
         if self.df is None:
             raise ValueError("Data not loaded. Call load_data() first.")
         
-        # Time-based features
-        self.df['Year'] = self.df['Date'].dt.year
-        self.df['Month'] = self.df['Date'].dt.month
-        self.df['Quarter'] = self.df['Date'].dt.quarter
-        self.df['DayOfWeek'] = self.df['Date'].dt.dayofweek
-        
-        # Returns
-        self.df['Daily_Return'] = self.df['Price'].pct_change()
-        self.df['Log_Return'] = np.log(self.df['Price']/self.df['Price'].shift(1))
-        
-        # Rolling statistics
-        self.df['Rolling_Mean_30'] = self.df['Price'].rolling(window=30).mean()
-        self.df['Rolling_Std_30'] = self.df['Price'].rolling(window=30).std()
+        self.df = self.pipeline.run(self.df, cache_name=os.path.abspath(self.filepath))
         
         return self.df
     
@@ -76,6 +235,29 @@ class DataPreprocessor:
         self.df.to_csv(output_path, index=False)
         print(f"Data saved to {output_path}")
         
+    def save_to_database(self, db_path, series='brent'):
+        """Write prices and log returns to the SQLite store read by the dashboard."""
+        if self.df is None:
+            raise ValueError("No data to save.")
+        
+        # sqlalchemy is only needed when writing to the database
+        from sqlite_store import SQLiteStore
+        
+        # Returns computed by create_features still hold for the first row after
+        # filter_date_range; recomputing here would turn that row's return into NaN
+        if 'Log_Return' in self.df.columns:
+            log_returns = self.df['Log_Return']
+        else:
+            log_returns = np.log(self.df['Price']/self.df['Price'].shift(1))
+        # Rows without a return are skipped, as load_price_csv does
+        records = [
+            {'date': date, 'price': price, 'log_return': log_return}
+            for date, price, log_return in zip(self.df['Date'], self.df['Price'], log_returns)
+            if not pd.isna(log_return)
+        ]
+        changed = SQLiteStore(db_path).write_prices(records, series=series)
+        print(f"{changed} price rows written to {db_path}")
+        
     def get_summary_stats(self):
         """Get summary statistics."""
         if self.df is None:
@@ -104,7 +286,8 @@ def load_events_data(filepath):
 
 if __name__ == "__main__":
     # Example usage
-    preprocessor = DataPreprocessor('../data/raw/brent_oil_prices.csv')
+    preprocessor = DataPreprocessor('../data/raw/brent_oil_prices.csv',
+                                    cache_dir='../data/cache/features')
     df = preprocessor.load_data()
     df = preprocessor.create_features()
     
@@ -0,0 +1,66 @@
+"""
+Shared schema for the events CSV written by fix_events_structure.py.
+
+The dashboard API (in memory or SQLite) serves events with the fields
+id, name, date, type, region and description, where type is one of the
+frontend's categories. This module maps CSV rows onto that shape.
+"""
+
+import hashlib
+
+import pandas as pd
+
+
+# CSV column names mapped to the API field names
+CSV_COLUMN_MAP = {
+    'event_name': 'name',
+    'event_type': 'category',
+}
+
+# Detailed CSV event types mapped to the API/frontend types
+EVENT_TYPE_MAP = {
+    'geopolitical conflict': 'political',
+    'conflict': 'political',
+    'terrorism': 'political',
+    'economic': 'economic',
+    'health': 'economic',
+    'policy': 'policy',
+    'opec policy': 'policy',
+    'sanctions': 'policy',
+}
+
+
+def stable_event_id(date, name):
+    """
+    Id derived from an event's date and name.
+
+    Unlike a position in date order, it does not change when other
+    events are added or removed.
+    """
+    key = f"{pd.to_datetime(date).strftime('%Y-%m-%d')}|{str(name).strip().lower()}"
+    # 31 bits keeps ids positive in SQLite and exact in JavaScript
+    return int(hashlib.sha1(key.encode()).hexdigest()[:8], 16) & 0x7FFFFFFF
+
+
+def event_type(category):
+    """API type for a detailed CSV event type, falling back to its lowercase form."""
+    if category is None:
+        return None
+    key = str(category).strip().lower()
+    return EVENT_TYPE_MAP.get(key, key)
+
+
+def load_events_csv(path):
+    """Read the events CSV into API-shaped event records."""
+    df = pd.read_csv(path).rename(columns=CSV_COLUMN_MAP)
+    df['date'] = pd.to_datetime(df['date'], errors='coerce')
+    df = df.dropna(subset=['date'])
+    df['date'] = df['date'].dt.strftime('%Y-%m-%d')
+    records = df.astype(object).where(df.notna(), None).to_dict('records')
+
+    for record in records:
+        if 'type' not in record:
+            record['type'] = event_type(record.get('category'))
+        if record.get('id') is None:
+            record['id'] = stable_event_id(record['date'], record.get('name'))
+    return records
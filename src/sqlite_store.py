@@ -0,0 +1,438 @@
+"""
+SQLite storage for Brent oil prices, events and change point results.
+
+The offline pipeline writes through a read-write store; the dashboard API
+reads through a read-only store. Filters, aggregates and event lookups
+run in SQL against indexed columns, so readers never need the whole
+dataset in memory. Every write bumps a dataset version that readers use
+to detect new data without restarting.
+
+Usage:
+    python sqlite_store.py DB_PATH [--prices CSV] [--events CSV] [--change-points JSON]
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import uuid
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import QueuePool
+
+from change_point_schema import load_change_point_json, to_api_change_points
+from event_schema import load_events_csv, stable_event_id
+
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS metadata (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS prices (
+        series TEXT NOT NULL,
+        date TEXT NOT NULL,
+        price REAL NOT NULL,
+        log_return REAL,
+        version INTEGER NOT NULL,
+        PRIMARY KEY (series, date)
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_prices_date ON prices (date)",
+    "CREATE INDEX IF NOT EXISTS idx_prices_series_version ON prices (series, version)",
+    "CREATE INDEX IF NOT EXISTS idx_prices_series_price ON prices (series, price)",
+    """CREATE TABLE IF NOT EXISTS events (
+        id INTEGER PRIMARY KEY,
+        date TEXT NOT NULL,
+        name TEXT,
+        type TEXT COLLATE NOCASE,
+        category TEXT,
+        region TEXT COLLATE NOCASE,
+        description TEXT,
+        expected_impact TEXT,
+        source TEXT
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_events_date ON events (date)",
+    "CREATE INDEX IF NOT EXISTS idx_events_type ON events (type, date)",
+    "CREATE INDEX IF NOT EXISTS idx_events_region ON events (region, date)",
+    """CREATE TABLE IF NOT EXISTS change_points (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        date TEXT NOT NULL,
+        data TEXT NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_change_points_date ON change_points (date)",
+]
+
+EVENT_COLUMNS = ['id', 'date', 'name', 'type', 'category', 'region', 'description', 'expected_impact', 'source']
+
+
+def to_date(value):
+    return pd.to_datetime(value).strftime('%Y-%m-%d')
+
+
+class SQLiteStore:
+    """Indexed SQLite storage with pooled connections."""
+
+    def __init__(self, path, read_only=False, pool_size=5):
+        """
+        Initialize store.
+
+        Args:
+            path (str): Path to the SQLite database file
+            read_only (bool): Open every connection read-only
+            pool_size (int): Connections kept open per process
+        """
+        self.path = os.path.abspath(path)
+        self.read_only = read_only
+        self.pool_size = pool_size
+        self._engines = {}
+        self._engines_lock = threading.Lock()
+
+        if read_only and not os.path.exists(self.path):
+            raise FileNotFoundError(f"Database not found: {self.path}")
+        if not read_only:
+            self.create_schema()
+
+    def _connect(self):
+        if self.read_only:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            conn.execute("PRAGMA query_only = ON")
+        else:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode = WAL")
+        return conn
+
+    @property
+    def engine(self):
+        """Connection pool for the current process.
+
+        Pools are never shared across a fork, so each worker process
+        (e.g. a gunicorn worker) opens its own connections.
+        """
+        pid = os.getpid()
+        with self._engines_lock:
+            if pid not in self._engines:
+                self._engines[pid] = create_engine(
+                    'sqlite://', creator=self._connect, poolclass=QueuePool,
+                    pool_size=self.pool_size, max_overflow=self.pool_size
+                )
+            return self._engines[pid]
+
+    def create_schema(self):
+        with self.engine.begin() as conn:
+            for statement in SCHEMA:
+                conn.execute(text(statement))
+            conn.execute(text("INSERT OR IGNORE INTO metadata (key, value) VALUES ('epoch', :epoch)"),
+                         {'epoch': uuid.uuid4().hex})
+            conn.execute(text("INSERT OR IGNORE INTO metadata (key, value) VALUES ('version', '0')"))
+
+    # Versioning
+
+    def get_version(self, conn=None):
+        """Return (epoch, version) of the stored dataset."""
+        if conn is None:
+            with self.engine.connect() as conn:
+                return self.get_version(conn)
+        rows = dict(conn.execute(text("SELECT key, value FROM metadata")).fetchall())
+        return rows.get('epoch'), int(rows.get('version', 0))
+
+    def _next_version(self, conn):
+        conn.execute(text("UPDATE metadata SET value = CAST(value AS INTEGER) + 1 WHERE key = 'version'"))
+        return self.get_version(conn)[1]
+
+    # Writes
+
+    def write_prices(self, records, series='brent'):
+        """
+        Insert new price rows and update revised ones.
+
+        Args:
+            records (list): Dicts with date, price and log_return
+            series (str): Price series name
+
+        Returns:
+            int: Number of rows inserted or changed
+        """
+        with self.engine.connect() as conn:
+            version = self._next_version(conn)
+            rows = [{
+                'series': series,
+                'date': to_date(r['date']),
+                'price': float(r['price']),
+                'log_return': None if r.get('log_return') is None or pd.isna(r['log_return']) else float(r['log_return']),
+                'version': version
+            } for r in records]
+            # Unchanged rows keep their version, so deltas only carry real changes
+            changed = 0
+            if rows:
+                changed = conn.execute(text(
+                    """INSERT INTO prices (series, date, price, log_return, version)
+                       VALUES (:series, :date, :price, :log_return, :version)
+                       ON CONFLICT (series, date) DO UPDATE SET
+                           price = excluded.price,
+                           log_return = excluded.log_return,
+                           version = excluded.version
+                       WHERE prices.price IS NOT excluded.price
+                          OR prices.log_return IS NOT excluded.log_return"""
+                ), rows).rowcount
+            if changed:
+                conn.commit()
+            else:
+                # Nothing changed, so don't hand readers a new version
+                conn.rollback()
+            return changed
+
+    def write_events(self, records):
+        """Replace all events."""
+        rows = []
+        for r in sorted(records, key=lambda e: to_date(e['date'])):
+            row = {col: r.get(col) for col in EVENT_COLUMNS}
+            row['date'] = to_date(r['date'])
+            # Events without an id get one derived from their date and name
+            if row['id'] is None:
+                row['id'] = stable_event_id(row['date'], row['name'])
+            row['id'] = int(row['id'])
+            # Filters compare stripped values, as the in-memory EventStore does
+            for col in ('type', 'region'):
+                if row[col] is not None:
+                    row[col] = str(row[col]).strip()
+            rows.append(row)
+        with self.engine.begin() as conn:
+            self._next_version(conn)
+            conn.execute(text("DELETE FROM events"))
+            if rows:
+                conn.execute(text(
+                    f"INSERT INTO events ({', '.join(EVENT_COLUMNS)}) "
+                    f"VALUES ({', '.join(':' + c for c in EVENT_COLUMNS)})"
+                ), rows)
+
+    def write_change_points(self, records):
+        """Replace all change points. Each record is stored whole as JSON."""
+        rows = [{'date': to_date(r['date']), 'data': json.dumps(r, default=str)} for r in records]
+        with self.engine.begin() as conn:
+            self._next_version(conn)
+            conn.execute(text("DELETE FROM change_points"))
+            if rows:
+                conn.execute(text("INSERT INTO change_points (date, data) VALUES (:date, :data)"), rows)
+
+    # Prices
+
+    def price_frame(self, series='brent', start_date=None, end_date=None, columns=('date', 'price', 'log_return')):
+        """Price rows in date order, filtered in SQL."""
+        clauses, params = self._range_clauses(start_date, end_date)
+        params['series'] = series
+        query = (f"SELECT {', '.join(columns)} FROM prices WHERE series = :series"
+                 f"{''.join(' AND ' + c for c in clauses)} ORDER BY date")
+        with self.engine.connect() as conn:
+            return pd.read_sql(text(query), conn, params=params)
+
+    def price_records(self, series='brent', start_date=None, end_date=None):
+        df = self.price_frame(series, start_date, end_date)
+        return df.astype(object).where(df.notna(), None).to_dict('records')
+
+    def price_delta(self, since_version, series='brent'):
+        """Return ((epoch, version), rows changed after since_version) from one snapshot."""
+        with self.engine.connect() as conn:
+            version = self.get_version(conn)
+            df = pd.read_sql(text(
+                "SELECT date, price, log_return FROM prices "
+                "WHERE series = :series AND version > :since ORDER BY date"
+            ), conn, params={'series': series, 'since': since_version})
+        return version, df.astype(object).where(df.notna(), None).to_dict('records')
+
+    def price_summary(self, series='brent'):
+        """Aggregate statistics computed in SQL."""
+        with self.engine.connect() as conn:
+            row = conn.execute(text(
+                """SELECT COUNT(*) AS n, MIN(date) AS start, MAX(date) AS end,
+                          AVG(price) AS mean, AVG(price * price) AS mean_sq,
+                          MIN(price) AS min, MAX(price) AS max
+                   FROM prices WHERE series = :series"""
+            ), {'series': series}).mappings().one()
+            n = row['n']
+            if n == 0:
+                return None
+
+            def quantile(q):
+                # Linear interpolation between order statistics, as pandas does
+                pos = (n - 1) * q
+                lo = int(np.floor(pos))
+                values = conn.execute(text(
+                    "SELECT price FROM prices WHERE series = :series "
+                    "ORDER BY price LIMIT 2 OFFSET :offset"
+                ), {'series': series, 'offset': lo}).scalars().all()
+                if len(values) == 1:
+                    return values[0]
+                return values[0] + (values[1] - values[0]) * (pos - lo)
+
+            variance = (row['mean_sq'] - row['mean'] ** 2) * n / (n - 1) if n > 1 else 0.0
+            return {
+                'count': n,
+                'start': row['start'],
+                'end': row['end'],
+                'mean': row['mean'],
+                'std': float(np.sqrt(max(variance, 0.0))),
+                'min': row['min'],
+                'max': row['max'],
+                'median': quantile(0.5),
+                'q1': quantile(0.25),
+                'q3': quantile(0.75)
+            }
+
+    # Events
+
+    def _range_clauses(self, start_date=None, end_date=None, column='date'):
+        clauses, params = [], {}
+        if start_date:
+            clauses.append(f"{column} >= :start")
+            params['start'] = to_date(start_date)
+        if end_date:
+            clauses.append(f"{column} <= :end")
+            params['end'] = to_date(end_date)
+        return clauses, params
+
+    def _event_filters(self, event_type=None, region=None):
+        clauses, params = [], {}
+        if event_type:
+            clauses.append("type = :type")
+            params['type'] = str(event_type).strip()
+        if region:
+            clauses.append("region = :region")
+            params['region'] = str(region).strip()
+        return clauses, params
+
+    def _event_rows(self, query, params):
+        with self.engine.connect() as conn:
+            rows = conn.execute(text(query), params).mappings().all()
+        return [{k: v for k, v in row.items() if v is not None} for row in rows]
+
+    def events(self, start_date=None, end_date=None, event_type=None, region=None):
+        clauses, params = self._range_clauses(start_date, end_date)
+        filter_clauses, filter_params = self._event_filters(event_type, region)
+        clauses += filter_clauses
+        params.update(filter_params)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        return self._event_rows(f"SELECT * FROM events{where} ORDER BY date, id", params)
+
+    def event(self, event_id):
+        rows = self._event_rows("SELECT * FROM events WHERE id = :id", {'id': int(event_id)})
+        return rows[0] if rows else None
+
+    def event_count(self):
+        with self.engine.connect() as conn:
+            return conn.execute(text("SELECT COUNT(*) FROM events")).scalar()
+
+    def nearest_events(self, date, limit=1, event_type=None, region=None):
+        """The `limit` events closest in time to `date`."""
+        # SQLite reads a negative LIMIT as "no limit"
+        limit = max(0, int(limit))
+        if limit == 0:
+            return []
+        clauses, params = self._event_filters(event_type, region)
+        params.update({'date': to_date(date), 'limit': limit})
+        extra = ''.join(' AND ' + c for c in clauses)
+        # Up to `limit` candidates from each side of the date, via the date index
+        candidates = self._event_rows(
+            f"""SELECT * FROM (SELECT * FROM events WHERE date < :date{extra}
+                               ORDER BY date DESC LIMIT :limit)
+                UNION ALL
+                SELECT * FROM (SELECT * FROM events WHERE date >= :date{extra}
+                               ORDER BY date LIMIT :limit)""",
+            params
+        )
+        target = pd.to_datetime(date)
+        candidates.sort(key=lambda e: abs(pd.to_datetime(e['date']) - target))
+        return candidates[:limit]
+
+    # Change points
+
+    def _change_point_record(self, row, event_ids):
+        record = json.loads(row['data'])
+        record['date'] = row['date']
+        record['associated_events'] = event_ids
+        return record
+
+    def change_points(self, tolerance_days):
+        """All change points with the ids of events within tolerance_days."""
+        window = {'before': f"-{int(tolerance_days)} days", 'after': f"+{int(tolerance_days)} days"}
+        with self.engine.connect() as conn:
+            rows = conn.execute(text(
+                """SELECT cp.id, cp.date, cp.data, e.id AS event_id
+                   FROM change_points cp
+                   LEFT JOIN events e
+                     ON e.date BETWEEN date(cp.date, :before) AND date(cp.date, :after)
+                   ORDER BY cp.date, cp.id, e.date, e.id"""
+            ), window).mappings().all()
+
+        records, current_id = [], None
+        for row in rows:
+            if row['id'] != current_id:
+                current_id = row['id']
+                records.append(self._change_point_record(row, []))
+            if row['event_id'] is not None:
+                records[-1]['associated_events'].append(row['event_id'])
+        return records
+
+    def change_point_count(self):
+        with self.engine.connect() as conn:
+            return conn.execute(text("SELECT COUNT(*) FROM change_points")).scalar()
+
+    def change_point_for_event(self, event_id, tolerance_days):
+        """The earliest change point within tolerance_days of an event, or None."""
+        window = {'id': int(event_id), 'before': f"-{int(tolerance_days)} days",
+                  'after': f"+{int(tolerance_days)} days"}
+        with self.engine.connect() as conn:
+            row = conn.execute(text(
+                """SELECT cp.id, cp.date, cp.data FROM events e
+                   JOIN change_points cp
+                     ON cp.date BETWEEN date(e.date, :before) AND date(e.date, :after)
+                   WHERE e.id = :id
+                   ORDER BY cp.date, cp.id LIMIT 1"""
+            ), window).mappings().first()
+            if row is None:
+                return None
+            event_ids = conn.execute(text(
+                "SELECT id FROM events WHERE date BETWEEN date(:date, :before) AND date(:date, :after) "
+                "ORDER BY date, id"
+            ), {'date': row['date'], 'before': window['before'], 'after': window['after']}).scalars().all()
+        return self._change_point_record(row, list(event_ids))
+
+
+def load_price_csv(path):
+    """Read a raw or processed price CSV into date/price/log_return records."""
+    df = pd.read_csv(path)
+    df.columns = [c.lower() for c in df.columns]
+    df['date'] = pd.to_datetime(df['date'], format='mixed', errors='coerce')
+    df = df.dropna(subset=['date', 'price']).sort_values('date')
+    df['log_return'] = np.log(df['price']) - np.log(df['price'].shift(1))
+    # The first row has no return; DataHandler drops it too
+    df = df.dropna(subset=['log_return'])
+    return df[['date', 'price', 'log_return']].to_dict('records')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load analysis outputs into the SQLite store.")
+    parser.add_argument('db_path', help="SQLite database file")
+    parser.add_argument('--prices', help="Price CSV with Date and Price columns")
+    parser.add_argument('--series', default='brent', help="Price series name")
+    parser.add_argument('--events', help="Events CSV from fix_events_structure.py")
+    parser.add_argument('--change-points', help="Change point results JSON")
+    args = parser.parse_args()
+
+    store = SQLiteStore(args.db_path)
+    if args.prices:
+        changed = store.write_prices(load_price_csv(args.prices), series=args.series)
+        print(f"Prices: {changed} rows inserted or updated")
+    if args.events:
+        events = load_events_csv(args.events)
+        store.write_events(events)
+        print(f"Events: {len(events)} rows written")
+    if args.change_points:
+        # Price means come from the stored prices, as the in-memory backend derives them
+        change_points = to_api_change_points(load_change_point_json(args.change_points),
+                                             store.price_frame(args.series))
+        store.write_change_points(change_points)
+        print(f"Change points: {len(change_points)} rows written")
+    print(f"Dataset version: {store.get_version()[1]}")